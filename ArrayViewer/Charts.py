@@ -2,51 +2,64 @@
 GraphWidget and ReshapeDialog for the ArrayViewer
 """
 # Author: Alex Schwarz <alex.schwarz@informatik.tu-chemnitz.de>
-import re
-from itertools import combinations
+import io
+import tokenize
+from functools import lru_cache
+from math import isqrt, prod
 from contextlib import suppress
 from PyQt5.QtWidgets import (QApplication, QCompleter, QDialog, QGridLayout, QLabel,
-                             QLineEdit, QSizePolicy, QTextEdit, QVBoxLayout, QWidget)
+                             QLineEdit, QPlainTextEdit, QSizePolicy, QVBoxLayout,
+                             QWidget)
 from PyQt5.QtWidgets import QDialogButtonBox as DBB
 from PyQt5 import QtCore
+from matplotlib import rcParams
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
-from matplotlib.ticker import FixedLocator
+from matplotlib.ticker import FixedLocator, FuncFormatter
 from matplotlib.widgets import Cursor
 from matplotlib.lines import Line2D
 from matplotlib.image import AxesImage
-from matplotlib.collections import PathCollection
+from matplotlib.collections import LineCollection, PathCollection
 import numpy as np
 from h5py._hl.dataset import Dataset
 
 
-def _flat_with_padding(Array, padding=1, fill=np.nan):
+def _flat_with_padding(Array, padding=1, fill=np.nan, dtype=None):
     """ Flatten ND array into a 2D array and add a padding with given fill """
     # Reshape the array to 3D
     Arr = np.reshape(Array, Array.shape[:2] + (-1, ))
     rows = _rows_from_dim(Array.shape)
-    # Add the padding to the right and bottom of the arrays
-    A0 = np.ones([padding, Arr.shape[1], Arr.shape[2]]) * fill
-    A1 = np.ones([Arr.shape[0] + padding, padding, Arr.shape[2]]) * fill
-    pArr = np.append(np.append(Arr, A0, axis=0), A1, axis=1)
-    # Stack the arrays according to the precalculated number of rows
-    pA2D = np.hstack(np.split(np.hstack(pArr.T).T, rows)).T
-    # Add the padding to the left and top of the arrays
-    A0 = np.ones([padding, pA2D.shape[1]]) * fill
-    A1 = np.ones([pA2D.shape[0] + padding, padding]) * fill
-    pA2D = np.append(A1, np.append(A0, pA2D, axis=0), axis=1)
+    cols = Arr.shape[2] // rows
+    h, w = Arr.shape[0] + padding, Arr.shape[1] + padding
+    # Preallocate the padded output and view it as (rows, w, cols, h) tiles
+    if dtype is None:
+        dtype = np.result_type(Arr, fill)
+    pA2D = np.empty((rows * w + padding, cols * h + padding), dtype=dtype)
+    tiles = pA2D[padding:, padding:].reshape(rows, w, cols, h)
+    # Only write the fill value into the padding, the data is written below
+    pA2D[:padding] = fill
+    pA2D[:, :padding] = fill
+    tiles[:, w - padding:] = fill
+    tiles[:, :, :, h - padding:] = fill
+    # Write the arrays into the tiles according to the number of rows. Tile
+    # t = r * cols + c holds Arr[:, :, t].T, which _unravel_flat_with_padding
+    # relies on. Splitting the last axis keeps the source a view, so this is
+    # the only copy of the data.
+    tiles[:, :w - padding, :, :h - padding] = \
+        Arr.T.reshape(rows, cols, w - padding, h - padding).transpose(0, 2, 1, 3)
     return pA2D
 
 
+@lru_cache(maxsize=128)
 def _rows_from_dim(dim):
-    """ Returns a reasonable row count for the given dimensionality """
+    """ Returns a reasonable row count for the given dimensionality (tuple) """
     if (len(dim) == 4 and .18 < 1.0 * dim[2] / dim[3] < 5.5):
         # If the Array is 4D and has reasonable ratio, keep that ratio.
         rows = dim[2]
     else:
         # Get the most equal division of the last dimension
-        last_dim = np.prod(dim[2:])
-        for n in range(int(np.sqrt(last_dim)), last_dim + 1):
+        last_dim = prod(dim[2:])
+        for n in range(isqrt(last_dim), last_dim + 1):
             if last_dim%n == 0:
                 rows = last_dim // n
                 break
@@ -54,78 +67,165 @@ def _rows_from_dim(dim):
 
 
 def _unravel_flat_with_padding(ind, sh, pad=1):
-    """ Unravel a clicked index onto its corresponding n-D-index """
-    ind = [i - pad if i > pad else 0 for i in ind]
-    cols = np.prod(sh[2:]) // _rows_from_dim(sh)
-    box_index = [ind[0] // (sh[0] + pad), ind[1] // (sh[1] + pad)]
-    ind.extend(np.unravel_index(box_index[1] * cols + box_index[0], sh[2:]))
-    ind[0] = ind[0] % (sh[0] + pad)
-    ind[1] = ind[1] % (sh[1] + pad)
-    return ind
+    """ Unravel a clicked index onto its corresponding n-D-index (tuple) """
+    cols = prod(sh[2:]) // _rows_from_dim(sh)
+    box0, i0 = divmod(ind[0] - pad if ind[0] > pad else 0, sh[0] + pad)
+    box1, i1 = divmod(ind[1] - pad if ind[1] > pad else 0, sh[1] + pad)
+    # Unravel the box index onto the remaining dimensions (C-order)
+    lin = box = box1 * cols + box0
+    tail = []
+    for s in reversed(sh[2:]):
+        lin, rest = divmod(lin, s)
+        tail.append(rest)
+    if lin:
+        raise ValueError(f"index {box} is out of bounds for array with size "
+                         f"{prod(sh[2:])}")
+    return (i0, i1, *reversed(tail))
+
+
+def _sliced_shape(shape, slices):
+    """ Returns the shape of the data cut by slices (None for integers) """
+    return [len(range(*sli.indices(n))) if isinstance(sli, slice)
+            else len(sli) if isinstance(sli, tuple) else None
+            for n, sli in zip(shape, slices)]
 
 
 def _get_shape_from_str(string):
     """
-    Returns an array with the elements of the string. All brackets are
+    Returns a tuple with the elements of the string. All brackets are
     removed as well as empty elements in the array.
     """
-    return np.array([_f for _f in string.strip("()[]").split(",") if _f],
-                    dtype=int)
+    return tuple(int(_f) for _f in string.strip("()[]").split(",") if _f)
 
 
 def _setlocator(axis, lim, nPad=None):
     """ Set the locator of an axis with the given limits and set the ticks """
     if isinstance(lim, list):
+        # Keep the default locator and label each tick from its position
         loc = axis.get_major_locator()()
-        axis.set_major_locator(FixedLocator(loc))
-        d = (np.arange(len(loc)) - 1) * (loc[2] - loc[1]) * lim[2] + lim[0]
+        is_int = (float((loc[2] - loc[1]) * lim[2]).is_integer()
+                  and float(lim[0]).is_integer())
+        label = (lambda v, _: _ticklabel(v * lim[2] + lim[0], is_int))
     elif isinstance(lim, tuple):
-        loc = np.arange(-lim[0] - nPad, lim[-1], lim[0] + nPad)
-        axis.set_major_locator(FixedLocator(loc))
-        d = loc - (np.arange(0, len(loc)) * nPad - nPad)
+        tile = lim[0] + nPad
+        axis.set_major_locator(FixedLocator(np.arange(-tile, lim[-1], tile)))
+        label = (lambda v, _: str(int(v) // tile * lim[0]))
     else:
         axis.set_major_locator(FixedLocator(np.arange(len(lim))))
-        d = lim
+        is_int = np.issubdtype(lim.dtype, np.integer) or np.all(np.mod(lim, 1) == 0)
+        label = (lambda v, _: _ticklabel(lim[int(v)], is_int))
+    axis.set_major_formatter(FuncFormatter(label))
 
-    if all(d.astype(int) == d.astype(float)):
-        axis.set_ticklabels(d.astype(int))
-    else:
-        d = np.vectorize(reformat)(d)
-        axis.set_ticklabels(d.astype(float))
+
+@lru_cache(maxsize=1024)
+def _ticklabel(value, is_int):
+    """ Returns the label of a single tick """
+    if is_int and float(value).is_integer():
+        return str(int(value))
+    return str(float(reformat(value)))
 
 
 def reformat(dat):
     """ Format the numberstrings correctly. """
     if dat is None or isinstance(dat, np.ma.core.MaskedConstant):
         return ""
-    if not 1e-5 < np.abs(dat) < 1e5:
+    if not 1e-5 < abs(dat) < 1e5:
         return f"{dat:.5e}"
     return f"{dat:.5f}"
 
 
-def _suggestion(previous_val, value):
-    """ Returns all possible factors """
-    pfactors = []
-    divisor = 2
-    while value > 1:
-        while value % divisor == 0:
-            pfactors.append(divisor)
-            value /= divisor
-        divisor += 1
+@lru_cache(maxsize=1)
+def _small_primes(limit=10000):
+    """ Returns all primes below limit (sieve of Eratosthenes) """
+    sieve = np.ones(limit, dtype=bool)
+    sieve[:2] = False
+    for p in range(2, isqrt(limit) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = False
+    return tuple(np.flatnonzero(sieve).tolist())
+
+
+@lru_cache(maxsize=128)
+def _factors(value):
+    """ Returns all factors (except one) of value in descending order """
+    # Prime factorization by the sieved small primes
+    pfactors = {}
+    primes = _small_primes()
+    for divisor in primes:
         if divisor * divisor > value:
-            if value > 1:
-                pfactors.append(value)
             break
-    factors = []
-    for n in range(1, len(pfactors) + 1):
-        for x in combinations(pfactors, n):
-            y = 1
-            for a in x:
-                y = y * a
-            factors.append(int(y))
-    factors = list(set(factors))
-    factors.sort(reverse=True)
-    return [previous_val + f"{i}," for i in factors]
+        while value % divisor == 0:
+            pfactors[divisor] = pfactors.get(divisor, 0) + 1
+            value //= divisor
+    else:
+        # Continue with a 6k+-1 wheel beyond the sieve
+        divisor = primes[-1] // 6 * 6 + 5
+        while divisor * divisor <= value:
+            for d in (divisor, divisor + 2):
+                while value % d == 0:
+                    pfactors[d] = pfactors.get(d, 0) + 1
+                    value //= d
+            divisor += 6
+    if value > 1:
+        pfactors[value] = pfactors.get(value, 0) + 1
+    # Build all divisors from the prime powers
+    divisors = [1]
+    for p, e in pfactors.items():
+        divisors = [x * p**k for x in divisors for k in range(e + 1)]
+    return tuple(sorted(divisors, reverse=True)[:-1])
+
+
+def _nanminmax(x, block=1 << 16):
+    """ Returns the minimum and maximum of x ignoring NaN values """
+    if x.size <= block:
+        return np.nanmin(x), np.nanmax(x)
+    if not x.flags.c_contiguous:
+        # Blocks of strided views are slow to read, reduce them in one pass
+        return np.fmin.reduce(x, axis=None), np.fmax.reduce(x, axis=None)
+    # Reduce blocks of the first axis, so both reductions read from the cache
+    step = max(1, block * x.shape[0] // x.size)
+    mins, maxs = [], []
+    for start in range(0, x.shape[0], step):
+        chunk = x[start:start + step]
+        mins.append(np.fmin.reduce(chunk, axis=None))
+        maxs.append(np.fmax.reduce(chunk, axis=None))
+    return np.fmin.reduce(mins), np.fmax.reduce(maxs)
+
+
+def _minmax_norm(x):
+    """ Scale the values of x to the range [0, 1] ignoring NaN values """
+    mn, mx = _nanminmax(x)
+    out = np.empty(x.shape)
+    np.subtract(x, mn, out=out)
+    # A constant column has no range, it stays at zero
+    if mx > mn:
+        out /= mx - mn
+    return out
+
+
+def _nan_max_mean_min(x, axis=0):
+    """ Returns the maximum, mean and minimum ignoring NaN values """
+    # fmax/fmin skip NaNs directly and the mean needs no NaN-free copy
+    valid = ~np.isnan(x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.sum(x, axis=axis, where=valid) / valid.sum(axis=axis)
+    return np.fmax.reduce(x, axis=axis), mean, np.fmin.reduce(x, axis=axis)
+
+
+def _short_str(data, threshold=200):
+    """ Returns the string of data, truncated for long lists and arrays """
+    if isinstance(data, np.ndarray):
+        with np.printoptions(threshold=threshold, edgeitems=3):
+            return str(data)
+    if isinstance(data, (list, tuple)) and len(data) > threshold:
+        txt = str(data[:threshold])
+        return f"{txt[:-1]}, ...{txt[-1]}"
+    return str(data)
+
+
+def _suggestion(previous_val, value):
+    """ Returns all possible factors """
+    return [f"{previous_val}{i}," for i in _factors(int(value))]
 
 
 class GraphWidget(QWidget):
@@ -144,35 +244,49 @@ class GraphWidget(QWidget):
         self._clim = (0, 1)
         self._fix_limits = [None, None]
         self._img = None
+        self._img_is_image = False
+        self._img_data = None
         self._cb = None
         self.has_cb = False
         self.has_operation = False
         self._colormap = 'viridis'
         self._opr = (lambda x: x)
-        self._oprdim = np.array([], dtype=int)
+        self._oprdim = set()
         self._oprcorr = None
         self.cutout = np.array([])
+        self._cutout_mm = (None, np.nan, np.nan)
+        self._scratch = None
+        self._segs = None
         self.ticks = [[0, -1, 1]]
         self._tick_str = [0, 0]
+        self._plot_sig = None
+        self._strategy = (None, None)
+        # Options are cached here and refreshed by set_options
+        self._hide_cursor = False
+        self._unsave = False
+        self._anim_speed_ms = 300
 
         # Add a cursor
         self._cursor = Cursor(self._axes, color='red', linewidth=1)
-        if self._ui.config.getboolean('opt', 'cursor', fallback=False):
-            self._cursor.visible = False
         self.last_clicked = (None, None)
-        self.annotation = self._figure.text(0.3, 0.95, "0, 0", visible=False)
+        # The annotation is animated and blitted onto the stored background
+        self._bg = None
+        self.annotation = self._figure.text(0.3, 0.95, "0, 0", visible=False,
+                                            backgroundcolor="silver",
+                                            animated=True)
         self._canv.mpl_connect('pick_event', self.onclick)
+        self._canv.mpl_connect('draw_event', self._on_draw)
 
         # Animation
         self._anim_timer = QtCore.QTimer()
-        self._anim_timer.setInterval(parent.config.getint('opt', 'anim_speed',
-                                                          fallback=300))
         self._anim_timer.timeout.connect(self._animate)
         self._anim_step = 0
         self._anim_dim = None
         self._anim_cutout = np.array([])
+        self.set_options()
+        self._anim_frames = np.array([])
 
-        self._canv.draw()
+        self._canv.draw_idle()
 
         # Add a label Text that may be changed in later Versions to display the
         # position and value below the mouse pointer
@@ -198,8 +312,18 @@ class GraphWidget(QWidget):
         elif isinstance(event.artist, AxesImage):
             xyz.append(int(np.round(event.mouseevent.xdata)))
             xyz.append(int(np.round(event.mouseevent.ydata)))
-            dat = reformat(event.artist.get_array()[xyz[1], xyz[0]])
+            # Read the value from the plotted data instead of the masked copy
+            val = self._img_data[xyz[1], xyz[0]]
+            dat = reformat(None if val != val else val)
             fstr = "x: {xyz[0]}, y: {xyz[1]}, z: {dat}"
+        elif isinstance(event.artist, LineCollection):
+            # Use the clicked column and the closest index within that line
+            line = event.ind[0]
+            x = int(np.clip(np.round(event.mouseevent.xdata), 0,
+                            self.cutout.shape[0] - 1))
+            xyz = [x, self.cutout[x, line]]
+            dat = reformat(xyz[1])
+            fstr = "x: {xyz[0]}, y: {dat}"
         elif isinstance(event.artist, PathCollection):
             xyz.append(event.mouseevent.xdata)
             xyz.append(event.mouseevent.ydata)
@@ -208,7 +332,7 @@ class GraphWidget(QWidget):
             fstr = str([float(d) for d in dat])[1:-2]
         # Adjust x and y value for reshaped data
         if len(self.ticks) > 2:
-            xyz = _unravel_flat_with_padding(xyz, self.cutout.shape)
+            xyz = list(_unravel_flat_with_padding(xyz, self.cutout.shape))
             fstr = "index: {xyz}, value: {dat}"
         # Replace index for picked values
         for i, tick in enumerate(self.ticks):
@@ -235,8 +359,26 @@ class GraphWidget(QWidget):
                 self.annotation.set_visible(True)
                 self.annotation.set_text(fstr.format(xyz=xyz, dat=dat))
                 self.last_clicked = xyz
-        # Refresh the canvas to show the changes
-        self._canv.draw()
+        # Only redraw the annotation on top of the stored background
+        self._blit_annotation()
+
+    def _on_draw(self, event):
+        """ Store the background after a full draw and add the annotation. """
+        if event.canvas is self._canv:
+            self._bg = self._canv.copy_from_bbox(self._figure.bbox)
+        # The annotation is a figure text, it belongs to the current plot
+        # only as long as the figure was not cleared
+        if self.annotation in self._figure.texts:
+            self.annotation.draw(event.renderer)
+
+    def _blit_annotation(self):
+        """ Show changes of the annotation without redrawing the figure. """
+        if self._bg is None:
+            self._canv.draw_idle()
+            return
+        self._canv.restore_region(self._bg)
+        self._figure.draw_artist(self.annotation)
+        self._canv.blit(self._figure.bbox)
 
     def fix_limit(self, idx):
         """ Fix the current value of the minimum(idx 0) or maximum(idx 1). """
@@ -252,14 +394,18 @@ class GraphWidget(QWidget):
             return False
         if dim in self._oprdim:
             # remove from operation dimensions
-            self._oprdim = np.setxor1d(self._oprdim, dim)
+            self._oprdim.discard(dim)
             data = self._ui.get(0)
             if isinstance(data, np.ndarray):
                 self.cutout = data
 
         self._anim_dim = dim - (self._tick_str[0] < dim).sum()
+        self.invalidate()
         self._anim_step = 0
         self._anim_cutout = self.cutout
+        if self._anim_dim < self.cutout.ndim:
+            # A view with the animated dimension first, so frames are no copies
+            self._anim_frames = np.moveaxis(self.cutout, self._anim_dim, 0)
         self._anim_timer.start()
         self._axes.clear()
         self.plot()
@@ -272,11 +418,16 @@ class GraphWidget(QWidget):
         if self._anim_timer.isActive():
             self._anim_timer.stop()
             self.cutout = self._anim_cutout
+            self._anim_frames = np.array([])
 
-    def set_anim_speed(self):
-        """ Set the timeout time of the animation timer. """
-        anim_speed = self._ui.config.getint('opt', 'anim_speed', fallback=300)
-        self._anim_timer.setInterval(anim_speed)
+    def set_options(self):
+        """ Read the graph related options from the config and apply them. """
+        config = self._ui.config
+        self._hide_cursor = config.getboolean('opt', 'cursor', fallback=False)
+        self._unsave = config.getboolean('opt', 'unsave', fallback=False)
+        self._anim_speed_ms = config.getint('opt', 'anim_speed', fallback=300)
+        self._cursor.visible = not self._hide_cursor
+        self._anim_timer.setInterval(self._anim_speed_ms)
 
     def spawn_micro_plot(self, location):
         """ Show a small window with the timecourse of selected location. """
@@ -302,26 +453,89 @@ class GraphWidget(QWidget):
         if self._anim_dim >= self._anim_cutout.ndim:
             self.stop_animation()
             return
-        self._anim_step = (self._anim_step + 1) % self._anim_cutout.shape[self._anim_dim]
-        self.cutout = self._anim_cutout.take(self._anim_step, self._anim_dim)
+        self._anim_step = (self._anim_step + 1) % len(self._anim_frames)
+        self.cutout = self._anim_frames[self._anim_step]
+        title = f"Animation on timestep: {self._anim_step}"
+        if self._update_lines():
+            self._axes.set_title(title)
+            self._canv.draw_idle()
+            return
+        if self._img_is_image and self.cutout.ndim >= 2:
+            # The plot type is fixed during an animation, so an image of the
+            # same shape only needs its data to be replaced
+            if self.cutout.ndim == 2:
+                dat = self._two_D_image()
+            else:
+                dat = self._n_D_image()[0]
+            if dat.shape == self._img.get_array().shape:
+                self._img.set_data(dat)
+                self._img_data = dat
+                if dat.ndim == 2:
+                    self._img.autoscale()
+                self._axes.set_title(title)
+                self._canv.draw_idle()
+                return
         self._axes.clear()
-        self._axes.set_title(f"Animation on timestep: {self._anim_step}")
+        self._axes.set_title(title)
         self.plot()
-        self._canv.draw()
+        self._canv.draw_idle()
+
+    def _update_lines(self):
+        """ Replace the data of the plotted lines, if their shape fits. """
+        if isinstance(self._img, LineCollection):
+            if (self._img not in self._axes.collections
+                    or self._segs.shape[1::-1] != self.cutout.shape):
+                return False
+            self._segs[:, :, 1] = self.cutout.T
+            self._img.set_segments(self._segs)
+            self._axes.ignore_existing_data_limits = True
+            self._axes.update_datalim(self._segs.reshape(-1, 2))
+        elif (self.cutout.ndim == 1 and isinstance(self._img, list)
+              and len(self._img) == 1 and self._img[0] in self._axes.lines
+              and len(self._img[0].get_ydata()) == len(self.cutout)):
+            self._img[0].set_ydata(self.cutout)
+            self._axes.relim()
+        else:
+            return False
+        self._axes.autoscale_view()
+        return True
+
+    def _cutout_minmax(self):
+        """ Returns the minimum and maximum of the cutout (cached). """
+        # Keep a reference to the cutout itself, as it is replaced on change
+        if self._cutout_mm[0] is not self.cutout:
+            self._cutout_mm = (self.cutout, *_nanminmax(self.cutout))
+        return self._cutout_mm[1:]
+
+    def _scratch_buffer(self, shape, dtype=np.float64):
+        """ Returns a float buffer of the given shape reused between plots. """
+        if (self._scratch is None or self._scratch.shape != shape
+                or self._scratch.dtype != dtype):
+            self._scratch = np.empty(shape, dtype=dtype)
+        return self._scratch
+
+    def _n_D_image(self):
+        """ Returns the image of multi-dimensional data and its padding. """
+        sh = self.cutout.shape
+        if self._ui.Plot3D.isChecked() and self.cutout.ndim == 3 and sh[2] == 3:
+            mm = self._cutout_minmax()
+            # Normalize into a reused contiguous buffer with swapped axes
+            dat = self._scratch_buffer((sh[1], sh[0], sh[2]))
+            np.subtract(np.swapaxes(self.cutout, 0, 1), mm[0], out=dat)
+            dat *= 1. / (mm[1] - mm[0])
+            return dat, -1
+        nPad = sh[0] // 100 + 1
+        # imshow does not support float16, so build the mosaic as float32
+        dtype = np.float32 if self.cutout.dtype == np.float16 else None
+        return _flat_with_padding(self.cutout, nPad, dtype=dtype), nPad
 
     def _n_D_plot(self):
         """ Plot multi-dimensional data. """
         sh = self.cutout.shape
-        nPad = sh[0] // 100 + 1
-        if self._ui.Plot3D.isChecked() and self.cutout.ndim == 3 and sh[2] == 3:
-            nPad = -1
-            mm = [np.nanmin(self.cutout), np.nanmax(self.cutout)]
-            dat = np.swapaxes((self.cutout - mm[0]) / (mm[1] - mm[0]), 0, 1)
-        else:
-            dat = _flat_with_padding(self.cutout, nPad)
-        if self.cutout.dtype == np.float16:
-            dat = dat.astype(np.float32)
+        dat, nPad = self._n_D_image()
         self._img = self._axes.imshow(dat, interpolation='none', aspect='auto')
+        self._img_is_image = True
+        self._img_data = dat
         self._set_ticks(self._tick_str[1], len(sh))
         _setlocator(self._axes.xaxis, sh + (dat.shape[1],), nPad)
         sh = (sh[1], sh[0]) + sh[2:]
@@ -330,30 +544,54 @@ class GraphWidget(QWidget):
     def _two_D_plot(self):
         """ Plot 2-dimensional data. """
         if self._ui.MMM.isChecked():
+            mx, mean, mn = _nan_max_mean_min(self.cutout)
             self._img = []
-            self._img += self._axes.plot(np.nanmax(self.cutout, axis=0), 'r')
-            self._img += self._axes.plot(np.nanmean(self.cutout, axis=0), 'k')
-            self._img += self._axes.plot(np.nanmin(self.cutout, axis=0), 'b')
+            self._img += self._axes.plot(mx, 'r')
+            self._img += self._axes.plot(mean, 'k')
+            self._img += self._axes.plot(mn, 'b')
             self._axes.legend(["Max", "Mean", "Min"])
         else:
-            dat = self.cutout.T
-            if self.cutout.dtype == np.float16:
-                dat = dat.astype(np.float32)
-            self._img = self._axes.imshow(dat, interpolation='none', aspect='auto')
+            self._img_data = self._two_D_image()
+            self._img = self._axes.imshow(self._img_data, interpolation='none',
+                                          aspect='auto')
+            self._img_is_image = True
         self._set_ticks(self._tick_str[1])
 
+    def _two_D_image(self):
+        """ Returns the image of 2-dimensional data. """
+        if self.cutout.dtype == np.float16:
+            # imshow does not support float16, so convert into a reused buffer
+            dat = self._scratch_buffer(self.cutout.shape[::-1], np.float32)
+            np.copyto(dat, self.cutout.T)
+            return dat
+        return self.cutout.T
+
+    def _multi_line_plot(self):
+        """ Plot each column as a line using a single LineCollection. """
+        length, nLines = self.cutout.shape
+        # Keep the segments, such that an animation can update them in place
+        self._segs = np.empty((nLines, length, 2))
+        self._segs[:, :, 0] = np.arange(length)
+        self._segs[:, :, 1] = self.cutout.T
+        # Use the same color cycle as separate plot calls would
+        colors = rcParams['axes.prop_cycle'].by_key()['color']
+        colors = [colors[i % len(colors)] for i in range(nLines)]
+        self._img = LineCollection(self._segs, colors=colors)
+        self._axes.add_collection(self._img)
+        self._axes.autoscale_view()
+
     def _n_D_scatter(self):
         """ Plot up to four rows as a scatter (x, y, size, color)"""
         if self.cutout.shape[1] < 4:
             col = 'b'
         else:
-            col = self.cutout[:, 3] - np.nanmin(self.cutout[:, 3])
-            col /= np.nanmax(col)
+            col = _minmax_norm(self.cutout[:, 3])
         if self.cutout.shape[1] < 3:
             siz = 25
         else:
-            siz = self.cutout[:, 2] - np.nanmin(self.cutout[:, 2])
-            siz = 1 + 100 * siz / np.nanmax(siz)
+            siz = _minmax_norm(self.cutout[:, 2])
+            siz *= 100
+            siz += 1
         self._img = self._axes.scatter(self.cutout[:, 0], self.cutout[:, 1],
                                        c=col, s=siz, cmap=self._colormap)
 
@@ -380,38 +618,45 @@ class GraphWidget(QWidget):
     def clear(self):
         """ Clear the figure. """
         self._cb = None
+        self._plot_sig = None
+        # Drop the reference to the last plotted data
+        self._strategy = (None, None)
+        self._img_is_image = False
+        self.annotation.set_visible(False)
+        self.last_clicked = (None, None)
         self._figure.clear()
         self._axes = self._figure.gca()
 
     def colorbar(self, minmax=None):
         """ Add a colorbar to the graph or remove it, if it is existing. """
-        if not isinstance(self._img, AxesImage):
+        if not self._img_is_image:
             return
         if minmax is not None and not isinstance(self._clim[0], bool):
             _vmin = minmax[0] * (self._clim[1] - self._clim[0]) + self._clim[0]
             _vmax = minmax[1] * self._clim[1]
-            self._img.set_clim(
-                vmin=_vmin if self._fix_limits[0] is None else self._fix_limits[0],
-                vmax=_vmax if self._fix_limits[1] is None else self._fix_limits[1]
-            )
+            clim = (_vmin if self._fix_limits[0] is None else self._fix_limits[0],
+                    _vmax if self._fix_limits[1] is None else self._fix_limits[1])
+            # Only renormalize the image if the limits have changed
+            if clim != self._img.get_clim():
+                self._img.set_clim(*clim)
         if not self.has_cb:
             if self._cb:
                 self._cb.remove()
                 self._cb = None
         elif self._cb is None:
             self._cb = self._figure.colorbar(self._img)
-        self._canv.draw()
+        self._canv.draw_idle()
 
     def colormap(self, mapname=None):
         """ Replace colormap with the given one. """
         if mapname:
             self._colormap = mapname
-        if not isinstance(self._img, AxesImage):
+        if not self._img_is_image:
             return
         if self._cb:
             self._cb.mappable.set_cmap(mapname)
         self._img.set_cmap(self._colormap)
-        self._canv.draw()
+        self._canv.draw_idle()
 
     def figure(self):
         """ Return the local figure variable. """
@@ -423,51 +668,152 @@ class GraphWidget(QWidget):
 
     def renew_cutout(self, data, slices):
         """ Renew the value of self.cutout with the given data and slices """
-        newslice = []
+        # Read one slab spanning all selected indices (a single read for h5py
+        # datasets) and gather the selected indices from it in memory.
+        slab, picks = [], []
         for i, sli in enumerate(slices):
             if isinstance(sli, tuple):
-                data = data.take(sli, axis=i)
-                newslice.append(slice(None))
+                sli = [x % data.shape[i] for x in sli]
+                step = sli[1] - sli[0] if len(sli) > 1 else 1
+                if step > 0 and sli == list(range(sli[0], sli[-1] + 1, step)):
+                    # Evenly spaced indices are a plain slice (no gather)
+                    slab.append(slice(sli[0], sli[-1] + 1, step))
+                    continue
+                start = min(sli)
+                slab.append(slice(start, max(sli) + 1))
+                picks.append((i, [x - start for x in sli]))
+            elif isinstance(sli, slice):
+                slab.append(sli)
             else:
-                newslice.append(sli)
-        self.cutout = data[tuple(newslice)].squeeze()
+                # Keep the dimension, such that the axes of picks stay valid
+                slab.append(slice(sli, sli + 1 or None))
+        cutout = data[tuple(slab)]
+        if picks:
+            # Gather all picked indices at once with an open mesh
+            idx = [np.arange(n) for n in cutout.shape]
+            for i, pick in picks:
+                idx[i] = pick
+            cutout = cutout[np.ix_(*idx)]
+        self.cutout = cutout.squeeze()
+
+    def _plot_signature(self, data, s, scalDims):
+        """ Returns everything that determines the content of the plot. """
+        ui = self._ui
+        opr = self._opr if self._oprdim else None
+        return (data, s, tuple(scalDims.tolist()), frozenset(self._oprdim),
+                opr, ui.Transp.isChecked(), ui.MMM.isChecked(),
+                ui.Plot2D.isChecked(), ui.PlotScat.isChecked(),
+                ui.Plot3D.isChecked(), ui.PrintFlat.isChecked())
+
+    def invalidate(self):
+        """ Force a complete redraw on the next call of renewPlot. """
+        self._plot_sig = None
+        self._strategy = (None, None)
 
     def renewPlot(self, s, scalDims):
         """ Draw given data. """
-        self._axes.clear()
         data = self._ui.get(0)
+        sig = self._plot_signature(data, s, scalDims)
+        prev = self._plot_sig
+        # Compare the data by identity, as == on arrays is elementwise
+        if prev is not None and sig[0] is prev[0] and sig[1:] == prev[1:]:
+            # Nothing has changed, so only refresh the colors
+            self.colorbar()
+            self.colormap()
+            self._canv.draw_idle()
+            return
+        self._plot_sig = sig
+        self._axes.clear()
+        self._img_is_image = False
         self._anim_timer.stop()
-        if isinstance(data, self.noPrintTypes):
-            # Print strings or lists of strings to the graph directly
-            self._axes.text(-0.1, 1.1, str(data), va='top', wrap=True)
-            self._axes.axis('off')
-        elif isinstance(data, Dataset) and data.shape == ():
-            # Print single values of h5py arrays to the graph directly
-            self._axes.text(-0.1, 1.1, data[()], va='top', wrap=True)
-            self._axes.axis('off')
-        elif isinstance(data[0], list):
-            # If there is an array of lists plot each element as a graph
-            self._img = [self._axes.plot(lst) for lst in data]
-        else:
-            non_scalar_idx = list(set(range(data.ndim)) - set(scalDims))
-            s_mod = tuple(s[i] for i in non_scalar_idx)
-            self._tick_str = [scalDims, s_mod]
-            # Cut out the chosen piece of the array and plot it
-            self.renew_cutout(data, s)
-            if len(self._oprdim) and not all(np.isin(self._oprdim, scalDims)):
-                a = np.setdiff1d(self._oprdim, scalDims)
-                self._oprcorr = tuple(b - (scalDims <= b).sum() for b in a)
-                self.cutout = self._opr(self.cutout)
+        try:
+            self._draw_strategy(data)(data, s, scalDims)
+        except Exception:
+            # Do not take the shortcut over a failed plot next time
+            self._plot_sig = None
+            raise
+
+    def _draw_strategy(self, data):
+        """ Returns the drawing method for the type of data (cached). """
+        if self._strategy[0] is not data:
+            if isinstance(data, self.noPrintTypes):
+                draw = self._draw_text
+            elif isinstance(data, Dataset) and data.shape == ():
+                draw = self._draw_h5_scalar
+            elif (isinstance(data, Dataset)
+                  or isinstance(data, np.ndarray) and data.dtype != object):
+                # Only object arrays can hold lists, so avoid reading data[0]
+                draw = self._draw_array
+            elif isinstance(data[0], list):
+                draw = self._draw_lists
             else:
-                self._oprcorr = None
-            # Transpose the first two dimensions if it is chosen
-            if self._ui.Transp.isChecked() and self.cutout.ndim > 1:
-                self.cutout = np.swapaxes(self.cutout, 0, 1)
-            self.plot()
-            self.reapply_setup()
+                draw = self._draw_array
+            self._strategy = (data, draw)
+        return self._strategy[1]
+
+    def _draw_text(self, data, *_):
+        """ Print strings or lists of strings to the graph directly. """
+        self._axes.text(-0.1, 1.1, _short_str(data), va='top', wrap=True)
+        self._axes.axis('off')
+
+    def _draw_h5_scalar(self, data, *_):
+        """ Print single values of h5py arrays to the graph directly. """
+        self._axes.text(-0.1, 1.1, data[()], va='top', wrap=True)
+        self._axes.axis('off')
+
+    def _draw_lists(self, data, *_):
+        """ If there is an array of lists plot each element as a graph. """
+        self._img = [self._axes.plot(lst) for lst in data]
+
+    def _draw_array(self, data, s, scalDims):
+        """ Cut out the chosen piece of the array and plot it. """
+        scalar = set(scalDims.tolist())
+        s_mod = tuple(s[i] for i in range(data.ndim) if i not in scalar)
+        self._tick_str = [scalDims, s_mod]
+        oprdim = self._oprdim - scalar
+        if self._refuse_lines(data.shape, s, scalar | oprdim):
+            return
+        self.renew_cutout(data, s)
+        if oprdim:
+            self._oprcorr = tuple(b - sum(1 for d in scalar if d <= b)
+                                  for b in sorted(oprdim))
+            self.cutout = self._opr(self.cutout)
+        else:
+            self._oprcorr = None
+        # Transpose the first two dimensions if it is chosen
+        if self._ui.Transp.isChecked() and self.cutout.ndim > 1:
+            self.cutout = np.swapaxes(self.cutout, 0, 1)
+        self.plot()
+        self.reapply_setup()
+
+    def _too_many_lines(self, nLines):
+        """ Check (and warn) if too many lines would be plotted. """
+        if nLines > 500 and not self._unsave:
+            msg = "You are trying to plot more than 500 lines!"
+            msg += " (change to 'unsave' mode in options to plot them anyway)"
+            self._ui.info_msg(msg, -1)
+            return True
+        return False
+
+    def _refuse_lines(self, shape, s, dropped):
+        """ Check the line limit before the cutout is calculated. """
+        if not self._ui.Plot2D.isChecked() or self._ui.PrintFlat.isChecked():
+            return False
+        # Scalar and operation dimensions vanish, just as squeezed ones
+        sh = [n for i, n in enumerate(_sliced_shape(shape, s))
+              if i not in dropped and n != 1]
+        if len(sh) != 2:
+            return False
+        if not self._too_many_lines(sh[0 if self._ui.Transp.isChecked() else 1]):
+            return False
+        self.cutout = np.array([])
+        self._plot_sig = None
+        self._canv.draw_idle()
+        return True
 
     def plot(self):
         """ Draw one plot step """
+        self._img_is_image = False
         # Check for empty dimensions
         if 0 in self.cutout.shape:
             self._axes.clear()
@@ -475,7 +821,8 @@ class GraphWidget(QWidget):
         # Print the Value(s) directly
         if self.cutout.ndim == 0 or self._ui.PrintFlat.isChecked():
             self._axes.set_ylim([0, 1])
-            self._axes.text(-0.1, 1.1, str(self.cutout), va='top', wrap=True)
+            self._axes.text(-0.1, 1.1, _short_str(self.cutout), va='top',
+                            wrap=True)
             self._axes.axis('off')
         # Graph an 1D-cutout
         elif self.cutout.ndim == 1:
@@ -487,13 +834,9 @@ class GraphWidget(QWidget):
         # 2D-cutout will be shown using imshow, scatter or plot
         elif self.cutout.ndim == 2:
             if self._ui.Plot2D.isChecked():
-                unsave = self._ui.config.getboolean('opt', 'unsave', fallback=False)
-                if self.cutout.shape[1] > 500 and not unsave:
-                    msg = "You are trying to plot more than 500 lines!"
-                    msg += " (change to 'unsave' mode in options to plot them anyway)"
-                    self._ui.info_msg(msg, -1)
+                if self._too_many_lines(self.cutout.shape[1]):
                     return
-                self._img = self._axes.plot(self.cutout)
+                self._multi_line_plot()
                 self._set_ticks(self._tick_str[1], 1)
             elif self._ui.PlotScat.isChecked() and self.cutout.shape[1] <= 4:
                 self._n_D_scatter()
@@ -502,7 +845,7 @@ class GraphWidget(QWidget):
         # higher-dimensional cutouts will first be flattened
         elif self.cutout.ndim >= 3:
             self._n_D_plot()
-        self._canv.draw()
+        self._canv.draw_idle()
 
     def reapply_setup(self):
         """
@@ -514,7 +857,7 @@ class GraphWidget(QWidget):
         self.colorbar()
         self.colormap()
         if self.cutout.size > 0:
-            self._clim = (np.nanmin(self.cutout), np.nanmax(self.cutout))
+            self._clim = self._cutout_minmax()
             # Set the minimum and maximum values from the data
             if self._ui.txtMin.text()[-1] != "\U0001F512":
                 self._ui.txtMin.setText(f"min : {reformat(self._clim[0])}")
@@ -530,34 +873,44 @@ class GraphWidget(QWidget):
                 i.set_picker(5.)
         else:
             self._img.set_picker(True)
-        self._cursor = Cursor(self._axes, useblit=False, color='red', linewidth=1)
-        if self._ui.config.getboolean('opt', 'cursor', fallback=False):
-            self._cursor.visible = False
-        self.annotation.remove()
-        self.annotation = self._figure.text(0.3, 0.95, "0, 0", visible=False,
-                                            backgroundcolor="silver")
-        self._canv.mpl_connect('pick_event', self.onclick)
+        # Only recreate the cursor, if its lines were cleared with the axes
+        if (self._cursor.ax is not self._axes
+                or self._cursor.lineh not in self._axes.lines):
+            self._cursor.disconnect_events()
+            self._cursor = Cursor(self._axes, useblit=False, color='red',
+                                  linewidth=1)
+            self._cursor.visible = not self._hide_cursor
+        if self.annotation in self._figure.texts:
+            self.annotation.set_visible(False)
+        else:
+            self.annotation = self._figure.text(0.3, 0.95, "0, 0",
+                                                visible=False,
+                                                backgroundcolor="silver",
+                                                animated=True)
 
     def set_operation(self, operation="None"):
         """ Set an operation to be performed on click on a dimension. """
         self.has_operation = (operation != "None")
         if not self.has_operation:
-            self._oprdim = np.array([], dtype=int)
+            self._oprdim = set()
             self._opr = (lambda x: x)
         else:
             operations = {'nanmin': np.nanmin, 'nanmax': np.nanmax,
                           'nanmean': np.nanmean, 'nanmedian': np.nanmedian}
-            self._opr = lambda x: operations[operation](x, axis=self._oprcorr)
-        return self._oprdim
+            opr = operations[operation]
+            self._opr = lambda x: opr(x, axis=self._oprcorr)
+        return sorted(self._oprdim)
 
     def set_oprdim(self, value):
         """ Set the operation dimension. """
-        if value == -1:
-            self._oprdim = np.array([], dtype=int)
+        if isinstance(value, list):
+            self._oprdim ^= set(value)
+        elif value == -1:
+            self._oprdim = set()
         else:
-            self._oprdim = np.setxor1d(self._oprdim, value)
+            self._oprdim ^= {value}
         if self.has_operation:
-            return self._oprdim
+            return sorted(self._oprdim)
         return []
 
     def toggle_colorbar(self):
@@ -566,8 +919,25 @@ class GraphWidget(QWidget):
         self.colorbar()
 
 
+class SuggestionWorker(QtCore.QRunnable):
+    """ Calculate the reshape suggestions outside of the GUI thread. """
+    def __init__(self, signal, request, previous_val, value):
+        """ Initialize. """
+        super().__init__()
+        self.signal = signal
+        self.request = request
+        self.previous_val = previous_val
+        self.value = value
+
+    def run(self):
+        """ Emit the suggestions together with the id of the request. """
+        self.signal.emit(self.request, _suggestion(self.previous_val, self.value))
+
+
 class ReshapeDialog(QDialog):
     """ A Dialog for Reshaping the Array. """
+    suggestionsDone = QtCore.pyqtSignal(int, list)
+
     def __init__(self, parent=None):
         """ Initialize. """
         super().__init__(parent)
@@ -597,6 +967,15 @@ class ReshapeDialog(QDialog):
         self.txtNew.setCompleter(self.cmpl)
         gridLayout.addWidget(self.txtNew, 1, 1, 1, 1)
 
+        # Debounce the suggestions and calculate them in a worker thread
+        self._request = 0
+        self._pending = None
+        self._suggestTimer = QtCore.QTimer(self)
+        self._suggestTimer.setSingleShot(True)
+        self._suggestTimer.setInterval(50)
+        self._suggestTimer.timeout.connect(self._start_suggestion)
+        self.suggestionsDone.connect(self._set_suggestions)
+
         # Add a button Box with "OK" and "Cancel"-Buttons
         self.buttonBox = DBB(DBB.Cancel|DBB.Ok, QtCore.Qt.Horizontal)
         gridLayout.addWidget(self.buttonBox, 3, 1, 1, 1)
@@ -606,20 +985,39 @@ class ReshapeDialog(QDialog):
     def _key_press(self, keyEv):
         """ Whenever a key is pressed check for comma and set autofill data."""
         if keyEv and keyEv[-1] == ',':
-            shape = _get_shape_from_str(str(keyEv))
-            if self.prodShape%shape.prod() == 0:
-                rest = self.prodShape // shape.prod()
-                self.cmpl.model().setStringList(_suggestion(keyEv, rest))
+            shape = prod(_get_shape_from_str(str(keyEv)))
+            if self.prodShape % shape == 0:
+                self._pending = (keyEv, self.prodShape // shape)
+                # Restart the timer, so that only the last input is used
+                self._suggestTimer.start()
             else:
+                self._request += 1
+                self._suggestTimer.stop()
                 self.cmpl.model().setStringList([keyEv + " Not fitting"])
         return keyEv
 
+    def _start_suggestion(self):
+        """ Start the calculation of the suggestions for the last input. """
+        self._request += 1
+        worker = SuggestionWorker(self.suggestionsDone, self._request,
+                                  *self._pending)
+        QtCore.QThreadPool.globalInstance().start(worker)
+
+    @QtCore.pyqtSlot(int, list)
+    def _set_suggestions(self, request, suggestions):
+        """ Show the suggestions, if they belong to the latest request. """
+        if request != self._request:
+            return
+        self.cmpl.model().setStringList(suggestions)
+        if self.txtNew.hasFocus():
+            self.cmpl.complete()
+
     def reshape_array(self, data):
         """ Reshape the currently selected array. """
         while True:
             # Open a dialog to reshape
             self.txtCurrent.setText(str(data.shape))
-            self.prodShape = np.array(data.shape).prod()
+            self.prodShape = prod(data.shape)
             self.txtNew.setText("")
             # If "OK" is pressed
             if data.shape and self.exec_():
@@ -629,12 +1027,13 @@ class ReshapeDialog(QDialog):
                     continue
                 # Try if the array could be reshaped that way
                 try:
-                    data = np.reshape(data, _get_shape_from_str(sStr))
+                    shape = _get_shape_from_str(sStr)
+                    data = np.reshape(data, shape)
                 # If it could not be reshaped, get another user input
                 except ValueError:
                     self.info_msg("Data could not be reshaped!", -1)
                     continue
-                return data, _get_shape_from_str(sStr)
+                return data, shape
             # If "CANCEL" is pressed
             return data, None
 
@@ -652,6 +1051,7 @@ class NewDataDialog(QDialog):
         self.data = {}
         self.lastText = ""
         self.returnVal = None
+        self._codecache = {}
 
         # Add the current and new shape boxes and their labels
         label = QLabel(self)
@@ -660,7 +1060,7 @@ class NewDataDialog(QDialog):
                        + "variable you want to save.\n"
                        + "Otherwise the original data will be overwritten."))
         Layout.addWidget(label)
-        self.history = QTextEdit(self)
+        self.history = QPlainTextEdit(self)
         self.history.setEnabled(False)
         Layout.addWidget(self.history)
         self.cmd = QLineEdit(self)
@@ -682,20 +1082,24 @@ class NewDataDialog(QDialog):
         try:
             var, value = self._parsecmd(str(self.cmd.text()))
             methods = {'np': np, 'self': self}
-            self.data[var] = eval(value, {'__buildins__': None}, methods)
+            # Only compile expressions that have not been used before
+            if value not in self._codecache:
+                self._codecache[value] = compile(value, '<input>', 'eval')
+            code = self._codecache[value]
+            self.data[var] = eval(code, {'__buildins__': None}, methods)
         except Exception as err:
             self.err.setText(str(err))
             return
-        self.history.append(self.cmd.text())
+        self.history.appendPlainText(self.cmd.text())
         self.lastText = str(self.cmd.text())
         self.cmd.setText("")
 
     def _on_save(self):
         """ Return the object currently in the textBox to the Viewer. """
-        if re.findall(r"\=", self.cmd.text()):
+        if "=" in self.cmd.text():
             return
         if self.cmd.text() == "":
-            self.returnVal = re.split(r"\=", self.lastText)[0].strip()
+            self.returnVal = self.lastText.split("=", 1)[0].strip()
             self.accept()
         else:
             self.returnVal = self.cmd.text().strip()
@@ -710,16 +1114,23 @@ class NewDataDialog(QDialog):
             var, expr = cmd.split("=", 1)
         except ValueError as e:
             raise ValueError("No '=' in expression") from e
-        for op in ['(', ')', '[', ']', '{', '}', ',',
-                   '+', '-', '*', '/', '%', '^']:
-            expr = expr.replace(op, f" {op} ")
-        expr = " " + expr + " "
-        for datum in self.data:
-            expr = expr.replace(f" {datum} ", f"self.data['{datum}']")
-        return var.strip(), expr.replace(" ", "")
+        # Replace variable names, but no attributes, keywords or strings
+        tokens = list(tokenize.generate_tokens(io.StringIO(expr).readline))
+        parts, last = [], 0
+        for prev, tok, nxt in zip([None] + tokens, tokens, tokens[1:] + [None]):
+            if (tok.type == tokenize.NAME and tok.string in self.data
+                    and not (prev and prev.string == '.')
+                    and not (nxt and nxt.string == '=')):
+                parts += [expr[last:tok.start[1]], f"self.data['{tok.string}']"]
+                last = tok.end[1]
+        parts.append(expr[last:])
+        return var.strip(), "".join(parts).strip()
 
     def new_data(self, data, cutout):
         """ Generate New Data (maybe using the currently selected array). """
+        if isinstance(data, Dataset):
+            # Large h5py datasets are kept in the file and read here
+            data = np.asarray(data)
         self.data = {'this': data, 'cutout': cutout}
         self.history.clear()
         while True:
@@ -729,7 +1140,7 @@ class NewDataDialog(QDialog):
             # If "Save" is pressed
             if self.exec_() or self.returnVal is not None:
                 if self.data['this'] is None:
-                    return (re.split(r"\=", self.lastText)[0].strip(),
+                    return (self.lastText.split("=", 1)[0].strip(),
                             self.data[self.returnVal])
                 if self.cmd.text() == "":
                     return 1, self.data[self.returnVal]
@@ -2,27 +2,56 @@
 Data Loader for the ArrayViewer.
 """
 # Author: Alex Schwarz <alex.schwarz@informatik.tu-chemnitz.de>
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle
-
+import mmap
 import os
+import pickle
 import re
-import scipy.io
+import sys
 import h5py
-from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
 from PIL import Image, ImageSequence
 import numpy as np
 
 
+# Numbers in text files, that could not be parsed as a table
+_NUMBER_RE = re.compile(rb'([-+]?\d+\.?\d*(?:[eE][-+]\d+)?)')
+
+
 def _open_image_file(fname):
     """ Open a file as an image. """
-    img = Image.open(fname)
-    if img.format == 'GIF':
-        image_seq = np.array([f.copy().convert('RGB') for f in ImageSequence.Iterator(img)])
-        return {'Value': np.moveaxis(image_seq, [2, 3, 0], [0, 2, 3])}
-    return {'Value': np.swapaxes(np.array(img), 0, 1)}
+    with Image.open(fname) as img:
+        if img.format == 'GIF':
+            image_seq = np.array([f.copy().convert('RGB') for f in ImageSequence.Iterator(img)])
+            return {'Value': np.moveaxis(image_seq, [2, 3, 0], [0, 2, 3])}
+        return {'Value': np.swapaxes(np.array(img), 0, 1)}
+
+
+def _read_h5py_dataset(dset, chunked_above=1 << 28):
+    """ Read a h5py dataset, large chunked ones chunk by chunk. """
+    if dset.chunks is None or dset.size * dset.dtype.itemsize <= chunked_above:
+        return np.array(dset)
+    # Read along the stored chunk layout into one preallocated buffer
+    data = np.empty(dset.shape, dtype=dset.dtype)
+    for chunk in dset.iter_chunks():
+        dset.read_direct(data, chunk, chunk)
+    return data
+
+
+def _open_h5py_file(fname):
+    """ Open a HDF5 file for reading with a larger chunk cache. """
+    # The default 1 MB cache is too small to keep the chunks of a slice, when
+    # large datasets are read partially or dereferenced repeatedly
+    return h5py.File(str(fname), 'r', rdcc_nbytes=64 * 1024**2,
+                     rdcc_nslots=100003, rdcc_w0=0.75)
+
+
+def _is_mat_struct(data):
+    """ Check for matlab structs without importing scipy for other files. """
+    # mat_structs only exist once scipy.io was imported to load them. Another
+    # loader may still be importing it, so the module can be incomplete.
+    matlab = getattr(sys.modules.get('scipy.io'), 'matlab', None)
+    mat_struct = getattr(matlab, 'mat_struct', None)
+    return mat_struct is not None and isinstance(data, mat_struct)
 
 
 class Loader(QObject):
@@ -30,13 +59,15 @@ class Loader(QObject):
     doneLoading = pyqtSignal(dict, str)
     load = pyqtSignal(str, str, bool, int)
     infoMsg = pyqtSignal(str, int)
+    doneFile = pyqtSignal(str)
 
     def __init__(self, parent=None):
         """ Initialize the Loader. """
         super().__init__(parent)
         self.fname = ''
         self.switch_to_last = False
-        self.load.connect(self._add_data)
+        self._pool = None
+        self.load.connect(self._start_loading)
 
     def _validate(self, data):
         """ Data validation. Replace lists of numbers with np.ndarray."""
@@ -46,7 +77,7 @@ class Loader(QObject):
                     if str(key)[:2] != "__"}
         elif isinstance(data, list):
             data = self._validate_list(data)
-        elif isinstance(data, scipy.io.matlab.mat_struct):
+        elif _is_mat_struct(data):
             # Create a dictionary from matlab structs
             data = data.__dict__
             data.pop('_fieldnames', None)
@@ -73,8 +104,8 @@ class Loader(QObject):
         if data != [] and not isinstance(data[0], str):
             # not all elements in the list have the same length
             if isinstance(data[0], list) and len(set(map(len, data))) != 1:
-                maxlen = len(sorted(data, key=len, reverse=True)[0])
-                data = [[xi + [np.nan] * (maxlen - len(xi))] for xi in data]
+                maxlen = max(map(len, data))
+                data = [xi + [np.nan] * (maxlen - len(xi)) for xi in data]
             try:
                 dat = np.array(data)
                 if dat.dtype == "O":
@@ -103,20 +134,28 @@ class Loader(QObject):
         if isinstance(data, h5py.Dataset):
             if data.dtype == "O":
                 dat = np.empty_like(data)
+                # Dataset.file creates a new File object on every access
+                file = data.file
                 try:
                     for x, d in enumerate(data[()]):
-                        names = [h5py.h5r.get_name(s, data.file.id) for s in d]
-                        dat[x, :] = [np.array(data.file[name]).tobytes()
+                        # Dereference each cell once instead of by its name
+                        targets = [file[ref] for ref in d]
+                        dat[x, :] = [np.array(t).tobytes()
                                      .decode(encoding="utf-16")
-                                     if data.file[name].dtype == "uint16"
-                                     else data.file[name] for name in names]
+                                     if t.dtype == "uint16" else t
+                                     for t in targets]
                     data = dat.astype(str).squeeze().tolist()
                 except ValueError:
                     data = np.array([data.file.get(d[0]) for d in data[()]][0])
                 except (OSError, TypeError):
                     data = self._h5py_val(data[()])
+            elif (data.size * data.dtype.itemsize > 1 << 30
+                  and not (self.switch_to_last and len(data.shape) > 1)):
+                # Keep very large datasets in the file, the plots only read
+                # the selected slices from it
+                return data
             else:
-                data = np.array(data)
+                data = _read_h5py_dataset(data)
         elif isinstance(data, h5py.Group):
             data = self._get_h5py_dict_data(data)
         elif isinstance(data, np.ndarray):
@@ -129,6 +168,15 @@ class Loader(QObject):
         return data
 
     @pyqtSlot(str, str, bool, int)
+    def _start_loading(self, fname, key, switch_to_last=False, max_file_size=15):
+        """ Load the file in the thread pool, so several files load at once. """
+        if self._pool is None:
+            # Each file is held in memory while loading, so only load a few
+            self._pool = QThreadPool(self)
+            self._pool.setMaxThreadCount(2)
+        self._pool.start(
+            LoadWorker(self, (fname, key, switch_to_last, max_file_size)))
+
     def _add_data(self, fname, key, switch_to_last=False, max_file_size=15):
         """ Add a new data to the dataset. Ask if the data already exists. """
         self.switch_to_last = switch_to_last
@@ -139,8 +187,10 @@ class Loader(QObject):
             return False
         # Load the different data types
         if fname.endswith('.hdf5'):
-            data = self._validate(h5py.File(str(fname), 'r'))
+            data = self._validate(_open_h5py_file(fname))
         elif fname.endswith('.mat'):
+            # scipy is slow to import, so only import it for matlab files
+            import scipy.io
             try:
                 # old matlab versions
                 data = self._validate(scipy.io.loadmat(str(fname),
@@ -148,7 +198,7 @@ class Loader(QObject):
                                                        struct_as_record=False))
             except NotImplementedError:
                 # v7.3
-                data = self._validate(h5py.File(str(fname), "r"))
+                data = self._validate(_open_h5py_file(fname))
         elif fname.endswith(('.npy', '.npz')):
             try:
                 data = self._validate(np.load(str(fname), allow_pickle=True))
@@ -156,24 +206,61 @@ class Loader(QObject):
                 data = self._validate(np.load(str(fname), allow_pickle=True,
                                               encoding='latin1'))
         elif fname.endswith(('.data', '.bin')):
-            try:
-                with open(str(fname), encoding='utf-8') as file:
-                    data = self._validate(pickle.load(file))
-            except UnicodeDecodeError:
-                with open(str(fname), 'rb') as file:
-                    data = self._validate(pickle.load(file, encoding='latin1'))
+            with open(str(fname), 'rb') as file:
+                try:
+                    data = pickle.load(file)
+                except UnicodeDecodeError:
+                    # Python 2 pickles with non-ascii strings
+                    file.seek(0)
+                    data = pickle.load(file, encoding='latin1')
+            data = self._validate(data)
         elif fname.endswith(('.txt', '.csv')):
-            with open(fname, encoding="utf-8") as f:
-                numberRegEx = r'([-+]?\d+\.?\d*(?:[eE][-+]\d+)?)'
-                lil = [re.findall(numberRegEx, line) for line in f.readlines()]
-                data = {'Value': np.array(lil, dtype=float)}
+            try:
+                # Parse regular tables directly
+                delimiter = ',' if fname.endswith('.csv') else None
+                data = {'Value': np.loadtxt(fname, delimiter=delimiter, ndmin=2)}
+            except ValueError:
+                # Otherwise extract all numbers line by line
+                with open(fname, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    lil = [_NUMBER_RE.findall(line)
+                           for line in iter(mm.readline, b'')]
+                # Skip lines without numbers and fill up shorter rows with NaN
+                lil = [[float(x) for x in row] for row in lil if row]
+                maxlen = max(map(len, lil), default=0)
+                data = {'Value': np.array([row + [np.nan] * (maxlen - len(row))
+                                          for row in lil])}
         else:
             try:
                 data = _open_image_file(fname)
             except (OSError, FileNotFoundError):
-                self.infoMsg('File type not recognized!', 1)
+                self.infoMsg.emit('File type not recognized!', 1)
+                self.doneLoading.emit({}, '')
                 return False
         if not isinstance(data, dict):
             data = {'Value': data}
         self.doneLoading.emit(data, key)
         return True
+
+
+class LoadWorker(QRunnable):
+    """ Load a single file outside of the Loader thread. """
+    def __init__(self, loader, args):
+        """ Initialize. """
+        super().__init__()
+        self.loader = loader
+        self.args = args
+
+    def run(self):
+        """ Load with a separate Loader, as the loader keeps per-file state. """
+        loader = Loader()
+        loader.doneLoading.connect(self.loader.doneLoading)
+        loader.infoMsg.connect(self.loader.infoMsg)
+        try:
+            loader._add_data(*self.args)
+        except Exception as err:
+            # Always finish loading, such that the loading item is removed
+            loader.infoMsg.emit(f"Could not load {self.args[0]}: {err}", -1)
+            loader.doneLoading.emit({}, '')
+        # Free the place of the file in the tree, if it was not loaded
+        self.loader.doneFile.emit(self.args[1])
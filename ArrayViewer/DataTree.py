@@ -7,6 +7,7 @@ from PyQt5.QtWidgets import (QHeaderView, QTabWidget, QTreeWidget,
                              QTreeWidgetItem)
 from PyQt5.QtWidgets import QSizePolicy as QSP
 from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
 
 
 class DataTree(QTabWidget):
@@ -21,6 +22,7 @@ class DataTree(QTabWidget):
         self.viewer = viewer
         self.keys = viewer.keys
         self.noPrintTypes = viewer.noPrintTypes
+        self._noPrintCache = {}
 
         # Add the Tree Widgets
         self.Tree = QTreeWidget(self)
@@ -85,16 +87,9 @@ class DataTree(QTabWidget):
             return
         self.Tree.itemChanged.disconnect(self._finish_renaming)
         # Check if the name exists in siblings
-        itemIndex = self.Tree.indexFromItem(self.changing_item, 1)
-        siblingTxt = []
-        if self.changing_item.parent():
-            for n in range(self.changing_item.parent().childCount()):
-                if itemIndex.sibling(n, 1) != itemIndex:
-                    siblingTxt.append(itemIndex.sibling(n, 1).data(0))
-        else:
-            for n in range(self.Tree.topLevelItemCount()):
-                if self.Tree.topLevelItem(n) != self.changing_item:
-                    siblingTxt.append(itemIndex.sibling(n, 1).data(0))
+        parent = self.changing_item.parent() or self.Tree.invisibleRootItem()
+        siblingTxt = {parent.child(n).text(1) for n in range(parent.childCount())
+                      if parent.child(n) is not self.changing_item}
         if new_trace[-1] in siblingTxt:
             self.changing_item.setData(0, 1, self.old_trace[-1])
             self.old_trace = []
@@ -125,16 +120,38 @@ class DataTree(QTabWidget):
         self.Tree.editItem(self.changing_item, 1)
         self.Tree.itemChanged.connect(self._finish_renaming)
 
+    def _no_print(self, value):
+        """ Check if value is of a noPrintType (cached by its type). """
+        # isinstance walks the whole tuple for every non-matching array
+        vtype = type(value)
+        noPrint = self._noPrintCache.get(vtype)
+        if noPrint is None:
+            noPrint = isinstance(value, self.noPrintTypes)
+            self._noPrintCache[vtype] = noPrint
+        return noPrint
+
+    @staticmethod
+    def _add_children(item, data):
+        """ Add the sorted keys as children and iterate over them. """
+        keys = realsorted(data.keys(), alg=ns.IC|ns.NA)
+        children = [QTreeWidgetItem([None, k]) for k in keys]
+        item.addChildren(children)
+        return zip(children, [data[k] for k in keys])
+
     def _update_subtree(self, item, data):
         """ Add a new subtree to the current QTreeWidgetItem. """
-        for n, k in enumerate(realsorted(data.keys(), alg=ns.IC|ns.NA)):
-            item.addChild(QTreeWidgetItem([None, k]))
-            child = item.child(n)
-            if isinstance(data[k], dict):
-                self._update_subtree(child, data[k])
-            elif not isinstance(data[k], self.noPrintTypes):
-                child.setCheckState(0, Qt.Unchecked)
-                self.checkableItems.append(child)
+        # Depth first without recursion, keeping the order of checkableItems
+        stack = [self._add_children(item, data)]
+        while stack:
+            for child, value in stack[-1]:
+                if isinstance(value, dict):
+                    stack.append(self._add_children(child, value))
+                    break
+                if not self._no_print(value):
+                    child.setCheckState(0, Qt.Unchecked)
+                    self.checkableItems.append(child)
+            else:
+                stack.pop()
 
     def _update_subtree_sec(self, item, data):
         """ Add a new subtree to the current QTreeWidgetItem. """
@@ -143,7 +160,7 @@ class DataTree(QTabWidget):
                 sitem = QTreeWidgetItem([None, s])
                 sitem.setToolTip(1, s)
                 item.addChild(sitem)
-            if not isinstance(data, self.noPrintTypes):
+            if not self._no_print(data):
                 for c in range(item.childCount()):
                     item.child(c).setCheckState(0, Qt.Unchecked)
                     self.checkableItems.append(item.child(c))
@@ -158,7 +175,7 @@ class DataTree(QTabWidget):
                         sitem = QTreeWidgetItem([None, s])
                         sitem.setToolTip(0, s)
                         child.addChild(sitem)
-                    if not isinstance(data[k], self.noPrintTypes):
+                    if not self._no_print(data[k]):
                         for c in range(child.childCount()):
                             child.child(c).setCheckState(0, Qt.Unchecked)
                             self.checkableItems.append(child.child(c))
@@ -167,7 +184,17 @@ class DataTree(QTabWidget):
         """ Add new data to TreeWidget. """
         itemList = []
         self.checkableItems = []
-        for i in self.keys:
+        # Files that are still loading keep their place in the tree
+        keys = list(self.keys)
+        loading = [k for k, busy in self.viewer._loading.items() if busy]
+        for k in loading:
+            self.viewer.insert_in_load_order(keys, k)
+        for i in keys:
+            if i in loading:
+                item = QTreeWidgetItem([None, self.viewer.lMsg])
+                item.setForeground(1, QColor("grey"))
+                itemList.append(item)
+                continue
             item = QTreeWidgetItem([None, i])
             item.setToolTip(0, i)
             self._update_subtree(item, self.viewer._data[i])
@@ -121,6 +121,8 @@ class EditorDialog(QDialog):
         """ Open the window to edit the currently selected data object """
         if type(data) in self.parent.noPrintTypes:
             return
+        # Large h5py datasets are kept in the (read-only) file, edit a copy
+        data = np.asarray(data)
         for s in range(8):
             if s < data.ndim:
                 self.dims.itemAt(s).widget().setValue(-1 * int(s < 2))
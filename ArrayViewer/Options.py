@@ -81,5 +81,5 @@ class OptionsDialog(QDialog):
                 self.parent.config.set('opt', key, option.text())
         # Perform actions based on new options.
         self.parent._set_dark_mode(self.options['darkmode'].isChecked())
-        self.parent.Graph.set_anim_speed()
+        self.parent.Graph.set_options()
         self.accept()
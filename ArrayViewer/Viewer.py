@@ -13,11 +13,11 @@ from configparser import ConfigParser, MissingSectionHeaderError
 
 import os.path
 from natsort import realsorted, ns
-from PyQt5.QtGui import QColor, QCursor, QIcon
+from PyQt5.QtGui import QCursor, QIcon
 from PyQt5.QtWidgets import (QAction, QActionGroup, QApplication, QCheckBox,
                              QFileDialog, QGridLayout, QLabel, QLineEdit,
                              QMainWindow, QMenu, QMenuBar, QMessageBox,
-                             QPushButton, QTreeWidgetItem, QWidget)
+                             QPushButton, QWidget)
 from PyQt5.QtWidgets import QSizePolicy as QSP
 from PyQt5.QtCore import pyqtSlot, Qt, QThread, QTimer
 import numpy as np
@@ -67,6 +67,8 @@ class ViewerWindow(QMainWindow):
         self.operations = {}
         self.cText = []
         self.keys = []
+        # Files in the order of selection, True while they are still loading
+        self._loading = {}
         self.diffNo = 0
         self.noPrintTypes = (int, float, str, list, tuple, type(None))
         self.reshapeBox = ReshapeDialog(self)
@@ -78,6 +80,7 @@ class ViewerWindow(QMainWindow):
         self.loader = Loader()
         self.loadThread = QThread()
         self.loader.doneLoading.connect(self.on_done_loading)
+        self.loader.doneFile.connect(self.on_done_file)
         self.loader.infoMsg.connect(self.info_msg)
         self.loader.moveToThread(self.loadThread)
         self.loadThread.start()
@@ -263,6 +266,8 @@ class ViewerWindow(QMainWindow):
         if newkey in [0, "data", ""]:
             newkey = self.cText
         reduce(getitem, newkey[:-1], self._data)[newkey[-1]] = newData
+        # The data may have been changed in place
+        self.Graph.invalidate()
 
     def _add_colorbar(self):
         """ Add a colorbar to the Graph Widget. """
@@ -286,8 +291,10 @@ class ViewerWindow(QMainWindow):
         if checkedItems != 2:
             self.info_msg(f"Checked {checkedItems} items. Should be 2!", -1)
         elif item0.shape == item1.shape:
+            # Large h5py datasets are kept in the file and read here
+            diff = np.asarray(item0) - np.asarray(item1)
             self._data[f"Diff {self.diffNo}"] = {text0: item0, text1: item1,
-                                                 "~> Diff [0]-[1]": item0 - item1}
+                                                 "~> Diff [0]-[1]": diff}
             self.keys.append(f"Diff {self.diffNo}")
             self.diffNo += 1
             self.datatree.currentWidget().setColumnHidden(0, True)
@@ -339,6 +346,9 @@ class ViewerWindow(QMainWindow):
             data = self.get(0)
         else:
             data = self.Graph.cutout
+        # Nothing is plotted (e.g. the plot was refused)
+        if data.size == 0:
+            return
         # Alt uses minimum Ctrl uses maximum
         if modifiers & Qt.AltModifier:
             idx = np.argmin(data)
@@ -425,7 +435,8 @@ class ViewerWindow(QMainWindow):
 
         # Perform the combination
         try:
-            newd = [data[k].flatten() for k in keys]
+            # Large h5py datasets are kept in the file and read here
+            newd = [np.asarray(data[k]).flatten() for k in keys]
         except ValueError:
             # For h5py dictionaries
             newd = [data.get(k)[()].flatten() for k in keys]
@@ -681,12 +692,12 @@ class ViewerWindow(QMainWindow):
                 else:
                     self.keys.remove(key)
             new_keys.append(key)
-            loadItem = QTreeWidgetItem([self.lMsg])
-            loadItem.setForeground(0, QColor("grey"))
-            self.datatree.Tree.addTopLevelItem(loadItem)
+            # Reserve the place of the file in the tree until it is loaded
+            self._loading[key] = True
             self.loader.load.emit(fname, key,
                                   self.config.getboolean('opt', 'first_to_last', fallback=False),
                                   self.config.getint('opt', 'max_file_size', fallback=15))
+        self.datatree.update_tree()
 
     ## PyQt Slots
     @pyqtSlot(str, int)
@@ -708,9 +719,34 @@ class ViewerWindow(QMainWindow):
         key = str(key)
         if key != "":
             self._data[key] = data
-            self.keys.append(key)
+            if key in self._loading:
+                self.insert_in_load_order(self.keys, key)
+            else:
+                self.keys.append(key)
+            self._finish_loading(key)
         self.datatree.update_tree()
 
+    @pyqtSlot(str)
+    def on_done_file(self, key):
+        """ Remove the place of a file that could not be loaded. """
+        if self._loading.get(key):
+            self._finish_loading(key)
+            self.datatree.update_tree()
+
+    def _finish_loading(self, key):
+        """ Mark the file as loaded and forget the order after the last one. """
+        if key in self._loading:
+            self._loading[key] = False
+        if not any(self._loading.values()):
+            self._loading = {}
+
+    def insert_in_load_order(self, keys, key):
+        """ Insert key into keys in the order in which the files were selected. """
+        order = list(self._loading)
+        later = set(order[order.index(key) + 1:])
+        keys.insert(next((i for i, k in enumerate(keys) if k in later),
+                         len(keys)), key)
+
     ## Overloaded PyQt Methods
     def keyPressEvent(self, ev):
         """ Catch keyPressEvents for [Delete] and [Ctrl]+[C]. """
@@ -0,0 +1,77 @@
+"""
+Tests for h5py datasets that are kept in the file instead of being loaded
+"""
+import os
+import sys
+import tempfile
+import unittest
+from configparser import ConfigParser
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+import numpy as np
+import h5py
+from PyQt5.QtWidgets import QApplication, QDialog
+from ArrayViewer.Viewer import ViewerWindow
+
+
+def _config():
+    """ Returns the default configuration. """
+    config = ConfigParser()
+    config.add_section('opt')
+    for key, val in dict(first_to_last='False', darkmode='False',
+                         anim_speed='300', cursor='False', unsave='False',
+                         max_file_size='15').items():
+        config.set('opt', key, val)
+    return config
+
+
+class LazyDatasetTest(unittest.TestCase):
+    """ Editing and deriving data from a read-only h5py.Dataset. """
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        fname = os.path.join(self.tmpdir.name, "lazy.hdf5")
+        with h5py.File(fname, 'w') as file:
+            file['a'] = np.arange(6.).reshape(2, 3)
+        # Opened read-only, as the Loader does
+        self.file = h5py.File(fname, 'r')
+        self.viewer = ViewerWindow(self.app, _config())
+        self.viewer.on_done_loading({'a': self.file['a']}, "k")
+        tree = self.viewer.datatree.Tree
+        tree.setCurrentItem(tree.topLevelItem(0).child(0))
+
+    def tearDown(self):
+        self.file.close()
+        self.tmpdir.cleanup()
+
+    def test_editor_saves_a_copy(self):
+        """ Editing a dataset replaces it with an edited array. """
+        editor = self.viewer.editorBox
+        editor.exec_ = lambda: QDialog.Accepted
+        editor.open_editor(self.viewer.get(0))
+        editor.changed_data[(1, 2)] = 10.
+        editor.save_data()
+        data = self.viewer.get(0)
+        self.assertIsInstance(data, np.ndarray)
+        self.assertEqual(data[1, 2], 10.)
+        self.assertEqual(self.file['a'][1, 2], 5.)
+
+    def test_new_data_from_dataset(self):
+        """ Expressions using 'this' work on datasets. """
+        dialog = self.viewer.newDataBox
+
+        def run_command():
+            dialog.cmd.setText("b = this * 2")
+            dialog._on_accept()
+            dialog.returnVal = "b"
+            return QDialog.Accepted
+        dialog.exec_ = run_command
+        _, data = dialog.new_data(self.viewer.get(0), self.viewer.Graph.cutout)
+        self.assertEqual(dialog.err.text(), "")
+        np.testing.assert_array_equal(data, np.arange(6.).reshape(2, 3) * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()